@@ -1,31 +1,62 @@
 from fastapi import HTTPException, Security
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 import jwt
-import os
-from dotenv import load_dotenv 
+import hashlib
+import threading
+import time
+from functools import lru_cache
+from cachetools import TTLCache
+from src.config import get_settings
 from supabase import create_client, Client
 
-# Load environment variables from .env file
-load_dotenv()
+# Load settings from the environment and .env
+settings = get_settings()
 
-SUPABASE_URL = os.getenv("SUPABASE_URL")
-SUPABASE_KEY = os.getenv("SUPABASE_KEY")
-SUPABASE_SERVICE_ROLE_KEY = os.getenv("SUPABASE_SERVICE_ROLE_KEY")
-SUPABASE_JWT_SECRET = os.getenv("SUPABASE_JWT_SECRET")
+SUPABASE_URL = settings.supabase_url
+SUPABASE_KEY = settings.supabase_key
+SUPABASE_SERVICE_ROLE_KEY = settings.supabase_service_role_key
+SUPABASE_JWT_SECRET = settings.supabase_jwt_secret
 
 security = HTTPBearer()  # Automatically expects 'Authorization: Bearer <token>'
 
+# Decoder and decode arguments are built once and reused for every verification
+_jwt_decoder = jwt.PyJWT()
+_jwt_decode_kwargs = {
+    # Encoded once so the HS256 key is handed to hmac as bytes on every call
+    "key": SUPABASE_JWT_SECRET.encode() if SUPABASE_JWT_SECRET else None,
+    "algorithms": ["HS256"],
+    "audience": "authenticated",
+    "options": {"require": ["exp"]},
+}
+
+# Cache of verified token payloads, keyed by the SHA-256 digest of the token (never the raw token)
+TOKEN_CACHE_TTL = 30  # seconds
+_token_cache = TTLCache(maxsize=10000, ttl=TOKEN_CACHE_TTL)
+_token_cache_lock = threading.Lock()
+
 # Dependency for verifying the JWT token
 def verify_jwt_token(credentials: HTTPAuthorizationCredentials = Security(security)):
     token = credentials.credentials  # Extract the token
+    key = hashlib.sha256(token.encode()).digest()
+    now = time.time()
+
+    with _token_cache_lock:
+        payload = _token_cache.get(key)
+    if payload is not None and payload["exp"] > now:
+        return payload
+
     try:
         # Decode and verify the JWT token
-        payload = jwt.decode(token, SUPABASE_JWT_SECRET, algorithms=["HS256"], audience="authenticated")
+        payload = _jwt_decoder.decode(token, **_jwt_decode_kwargs)
+        # Only successful verifications are cached; hits are re-checked against "exp" above
+        with _token_cache_lock:
+            _token_cache[key] = payload
         # If decoding succeeds, return the payload (or parts of it)
         return payload
     except Exception as e:
         # Raise an HTTP 401 error if the token is invalid or expired
         raise HTTPException(status_code=401, detail="Invalid or expired token")
 
+@lru_cache(maxsize=1)
 def get_supabase_client() -> Client:
     return create_client(SUPABASE_URL, SUPABASE_SERVICE_ROLE_KEY)
\ No newline at end of file
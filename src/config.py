@@ -0,0 +1,23 @@
+from functools import lru_cache
+from typing import Optional
+from pydantic_settings import BaseSettings, SettingsConfigDict
+
+
+class Settings(BaseSettings):
+    model_config = SettingsConfigDict(env_file=".env", extra="ignore")
+
+    supabase_url: Optional[str] = None
+    supabase_key: Optional[str] = None
+    supabase_service_role_key: Optional[str] = None
+    supabase_jwt_secret: Optional[str] = None
+
+    user_managing_server_port: str = "8080"
+    user_managing_server_mode: str = "development"
+    frontend_url: str = "http://localhost:3000"
+    backend_url: str = "http://localhost:8080"
+
+
+# Settings are read from the environment and .env once per process
+@lru_cache
+def get_settings() -> Settings:
+    return Settings()
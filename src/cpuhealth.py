@@ -1,27 +1,103 @@
+import asyncio
 import psutil
+from time import time, monotonic
 from src.models import HealthComponent
 
+CPU_SAMPLE_INTERVAL = 1  # seconds between CPU usage samples
+LOAD_AVG_TTL = 5  # seconds a load average reading is reused
+
+# cgroup v2 files describing the container's CPU usage and quota
+CGROUP_CPU_STAT = "/sys/fs/cgroup/cpu.stat"
+CGROUP_CPU_MAX = "/sys/fs/cgroup/cpu.max"
+
+# Latest readings, refreshed by sample_cpu_usage so health checks never block
+_cpu_state = {
+    "cpu_usage": None,
+    "load_avg": (0, 0, 0),
+    "load_avg_sampled_at": 0.0,
+}
+
+def read_cgroup_cpu_usage():
+    """
+    Return the cgroup's total CPU time in microseconds, or None outside a cgroup v2 container.
+    """
+    try:
+        with open(CGROUP_CPU_STAT) as f:
+            for line in f:
+                if line.startswith("usage_usec "):
+                    return int(line.split()[1])
+    except (OSError, ValueError):
+        pass
+    return None
+
+def read_cpu_limit() -> float:
+    """
+    Return the number of CPUs the container may use, from its cgroup quota if one is set.
+    """
+    try:
+        with open(CGROUP_CPU_MAX) as f:
+            quota, period = f.read().split()
+        if quota != "max":
+            return int(quota) / int(period)
+    except (OSError, ValueError):
+        pass
+    return psutil.cpu_count(logical=True) or 1
+
+# Background sampler, started on application startup
+async def sample_cpu_usage():
+    cpu_limit = read_cpu_limit()
+    process = psutil.Process()
+    process.cpu_percent(interval=None)  # First call only sets the baseline
+    last_usage = read_cgroup_cpu_usage()
+    last_sampled_at = monotonic()
+
+    while True:
+        await asyncio.sleep(CPU_SAMPLE_INTERVAL)
+        now = monotonic()
+        usage = read_cgroup_cpu_usage()
+
+        if usage is not None and last_usage is not None:
+            # Share of the cgroup quota used since the previous sample
+            cpu_usage = (usage - last_usage) / ((now - last_sampled_at) * 1_000_000 * cpu_limit) * 100
+        else:
+            # Outside a cgroup v2 container, fall back to this process' own usage
+            cpu_usage = process.cpu_percent(interval=None) / cpu_limit
+
+        _cpu_state["cpu_usage"] = round(cpu_usage, 1)
+        last_usage = usage
+        last_sampled_at = now
+
+        if hasattr(psutil, "getloadavg") and time() - _cpu_state["load_avg_sampled_at"] >= LOAD_AVG_TTL:
+            _cpu_state["load_avg"] = psutil.getloadavg()
+            _cpu_state["load_avg_sampled_at"] = time()
+
 # CPU Health Check
 def check_cpu_health() -> HealthComponent:
     try:
-        # Get CPU usage percentage
-        cpu_usage = psutil.cpu_percent(interval=1)  # 1-second average
+        # Read the CPU usage percentage sampled in the background
+        cpu_usage = _cpu_state["cpu_usage"]
         cpu_count = psutil.cpu_count(logical=True)
-        load_avg = psutil.getloadavg() if hasattr(psutil, "getloadavg") else (0, 0, 0)
-        
+        load_avg = _cpu_state["load_avg"]
+
+        if cpu_usage is None:
+            return HealthComponent(
+                status="UP",
+                details=f"CPU usage not sampled yet. Logical CPUs: {cpu_count}"
+            )
+
         # Define thresholds
         MAX_CPU_USAGE = 85  # Example threshold for high CPU usage
-        
+
         if cpu_usage > MAX_CPU_USAGE:
             return HealthComponent(
                 status="DOWN",
                 details=f"High CPU usage detected: {cpu_usage}%. Load average (1m, 5m, 15m): {load_avg}"
             )
-        
+
         return HealthComponent(
             status="UP",
             details=f"CPU usage at {cpu_usage}%. Load average (1m, 5m, 15m): {load_avg}. Logical CPUs: {cpu_count}"
         )
-    
+
     except Exception as e:
         return HealthComponent(status="DOWN", details=f"Failed to check CPU health: {str(e)}")
@@ -1,31 +1,106 @@
-from fastapi import FastAPI, HTTPException, Depends, Request
-from src.models import User, UserUpdate, UserCreate, HealthResponse, HealthComponent, HealthStatus
+from fastapi import FastAPI, APIRouter, HTTPException, Depends, Request
+from src.models import UserUpdate, UserCreate, HealthResponse, HealthComponent, HealthStatus
 from src.auth_handler import verify_jwt_token, get_supabase_client
-from dotenv import load_dotenv
-import os
-import requests
+from src.config import get_settings
+import logging
+import asyncio
+from functools import lru_cache
+import httpx
+import orjson
+import ijson
+from cachetools import TTLCache
+from pydantic import TypeAdapter
 import pybreaker
-import re
-from tenacity import retry, stop_after_attempt, wait_exponential, retry_if_exception_type, RetryError
-from src.cpuhealth import check_cpu_health
+from uuid import UUID
+from typing import Awaitable, Callable, Dict, List, Tuple, Union
+from tenacity import retry, stop_after_attempt, wait_random_exponential, retry_if_exception_type
+from src.user_loader import UserLoader
+from src.cpuhealth import check_cpu_health, sample_cpu_usage
 from src.diskhealth import check_disk_health
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse
 from prometheus_fastapi_instrumentator import Instrumentator
-from prometheus_client import Counter, Summary
-from time import time
-
-# Load environment variables
-load_dotenv()
-
-SUPABASE_URL = os.getenv("SUPABASE_URL")
-SUPABASE_GRAPHQL_URL = f"{SUPABASE_URL}/graphql/v1"
-SUPABASE_SERVICE_ROLE_KEY = os.getenv("SUPABASE_SERVICE_ROLE_KEY")
-SUPABASE_KEY = os.getenv("SUPABASE_KEY")
-USER_MANAGING_SERVER_PORT = os.getenv("USER_MANAGING_SERVER_PORT", "8080")
-USER_MANAGING_SERVER_MODE = os.getenv("USER_MANAGING_SERVER_MODE", "development")
+from prometheus_client import Counter, Histogram
+from time import time, monotonic
+
+# Load settings from the environment and .env
+settings = get_settings()
+
+logger = logging.getLogger(__name__)
+
+SUPABASE_URL = settings.supabase_url
+SUPABASE_GRAPHQL_PATH = "/graphql/v1"
+SUPABASE_GRAPHQL_URL = f"{SUPABASE_URL}{SUPABASE_GRAPHQL_PATH}"
+SUPABASE_METRICS_PATH = "/customer/v1/privileged/metrics"
+SUPABASE_SERVICE_ROLE_KEY = settings.supabase_service_role_key
+SUPABASE_KEY = settings.supabase_key
+USER_MANAGING_SERVER_PORT = settings.user_managing_server_port
+USER_MANAGING_SERVER_MODE = settings.user_managing_server_mode
 USER_MANAGING_PREFIX = f"/user-managing" if USER_MANAGING_SERVER_MODE == "release" else ""
-FRONTEND_URL = os.getenv("FRONTEND_URL", "http://localhost:3000")
-BACKEND_URL = os.getenv("BACKEND_URL", "http://localhost:8080")
+FRONTEND_URL = settings.frontend_url
+BACKEND_URL = settings.backend_url
+
+# Static request parts shared by every Supabase GraphQL call
+SUPABASE_HEADERS = {
+    "Authorization": f"Bearer {SUPABASE_SERVICE_ROLE_KEY}",
+    "Content-Type": "application/json",
+    "apikey": SUPABASE_KEY,
+}
+
+# Basic auth for the metrics endpoint; the header value is encoded once here
+SUPABASE_METRICS_AUTH = httpx.BasicAuth("service_role", SUPABASE_SERVICE_ROLE_KEY or "")
+
+UPDATE_USER_QUERY = """
+    mutation UpdateUser($id: UUID!, $set: users_dataUpdateInput!) {
+        updateusers_dataCollection(
+            filter: { id: { eq: $id } }
+            set: $set
+            atMost: 1
+        ) {
+            records{
+                first_name
+                last_name
+                location
+                longitude
+                latitude
+            }
+        }
+    }
+"""
+
+GET_USERS_QUERY = """
+    query GetUsersByIds($ids: [UUID!]!, $first: Int!){
+        users_dataCollection(filter: { id: { in: $ids } }, first: $first){
+            edges {
+                node {
+                    first_name last_name id email created_at latitude longitude location
+                }
+            }
+        }
+    }
+"""
+
+# pg_graphql returns at most this many rows per page
+MAX_USERS_PER_BATCH = 30
+
+# PostgREST upsert of a users_data row: insert, or merge into the row with the same id
+SUPABASE_USERS_REST_PATH = "/rest/v1/users_data"
+UPSERT_USER_PARAMS = {
+    "on_conflict": "id",
+    "select": "id,email,first_name,last_name,location,latitude,longitude",
+}
+UPSERT_USER_HEADERS = {"Prefer": "resolution=merge-duplicates,return=representation"}
+
+# Request body serializers, built once; dump_json yields JSON bytes, so bodies skip a dict round-trip
+USER_UPDATE_ADAPTER = TypeAdapter(UserUpdate)
+USER_CREATE_ADAPTER = TypeAdapter(UserCreate)
+
+# Recently fetched users, keyed by user ID. Only touched from the event loop, so no lock is needed.
+USER_CACHE_TTL = 10  # seconds
+user_cache = TTLCache(maxsize=10_000, ttl=USER_CACHE_TTL)
+
+# Background CPU sampler task, so CPU health checks never block
+cpu_sampler_task: asyncio.Task = None
 
 app = FastAPI(
     title="User Management API",
@@ -34,6 +109,7 @@ app = FastAPI(
     openapi_url=f"{USER_MANAGING_PREFIX}/openapi.json",
     docs_url=f"{USER_MANAGING_PREFIX}/docs",
     redoc_url=f"{USER_MANAGING_PREFIX}/redoc",
+    default_response_class=ORJSONResponse,
 )
 
 origins = [
@@ -52,28 +128,89 @@ app.add_middleware(
 )
 
 # Circuit Breaker Configuration
-breaker = pybreaker.CircuitBreaker(
-    fail_max=3,  
-    reset_timeout=30  
-)
+BREAKER_RESET_TIMEOUT = 30  # seconds
+BREAKER_MAX_RESET_TIMEOUT = 300  # seconds
+
+class BackoffListener(pybreaker.CircuitBreakerListener):
+    """Double the reset timeout each time a half-open probe fails; restore it once the breaker closes."""
+
+    def state_change(self, cb, old_state, new_state):
+        if old_state.name == pybreaker.STATE_HALF_OPEN and new_state.name == pybreaker.STATE_OPEN:
+            cb.reset_timeout = min(cb.reset_timeout * 2, BREAKER_MAX_RESET_TIMEOUT)
+        elif new_state.name == pybreaker.STATE_CLOSED:
+            cb.reset_timeout = BREAKER_RESET_TIMEOUT
+
+def create_breaker():
+    return pybreaker.CircuitBreaker(
+        fail_max=3,
+        reset_timeout=BREAKER_RESET_TIMEOUT,
+        listeners=[BackoffListener()]
+    )
+
+# One breaker per operation, so failing writes cannot block reads (and vice versa).
+# They must stay module-scoped: a breaker created per call never accumulates failures
+# and leaks its listeners.
+read_breaker = create_breaker()
+update_breaker = create_breaker()
+insert_breaker = create_breaker()
 
 # Retry Configuration
 def is_transient_error(exception):
     """Define what qualifies as a transient error."""
-    return isinstance(exception, requests.exceptions.RequestException)
+    return isinstance(exception, httpx.HTTPError)
 
 retry_strategy = retry(
     stop=stop_after_attempt(3),  # Retry up to 3 times
-    wait=wait_exponential(multiplier=1, min=2, max=6),  # Exponential backoff: 2s, 4s, 6s
-    retry=retry_if_exception_type(requests.exceptions.RequestException)  # Retry only on network-related errors
+    wait=wait_random_exponential(multiplier=0.5, max=6),  # Jittered exponential backoff, capped at 6s
+    retry=retry_if_exception_type(httpx.HTTPError),  # Retry only on network-related errors
+    reraise=True  # Surface the last httpx error instead of wrapping it in RetryError
 )
 
+# Raised when Supabase answers a GraphQL query with errors. The answer will not change on a
+# retry and the service is reachable, so neither the retry policy nor the breaker count it.
+class SupabaseGraphQLError(Exception):
+    pass
+
+# Shared Supabase HTTP client (app.state.http), created on startup and closed on shutdown.
+# The static headers are set once on the client instead of being passed with every request.
+@app.on_event("startup")
+async def open_http_client():
+    app.state.http = httpx.AsyncClient(
+        base_url=SUPABASE_URL or "",
+        headers=SUPABASE_HEADERS,
+        http2=True,
+        timeout=httpx.Timeout(5.0, connect=2.0),
+        limits=httpx.Limits(max_connections=100, max_keepalive_connections=20),
+    )
+    logger.debug("Supabase GraphQL endpoint: %s", SUPABASE_GRAPHQL_URL)
+
+@app.on_event("shutdown")
+async def close_http_client():
+    await app.state.http.aclose()
+
+@app.on_event("startup")
+async def create_user_loader():
+    app.state.user_loader = UserLoader(fetch_users_from_supabase, user_cache, max_batch_size=MAX_USERS_PER_BATCH)
+
+@app.on_event("startup")
+async def start_cpu_sampler():
+    global cpu_sampler_task
+    cpu_sampler_task = asyncio.create_task(sample_cpu_usage())
+
+@app.on_event("shutdown")
+async def stop_cpu_sampler():
+    cpu_sampler_task.cancel()
+
 # Initialize Prometheus instrumentator
 Instrumentator().instrument(app).expose(app, endpoint=f"{USER_MANAGING_PREFIX}/metrics")
 
 # Additional custom metrics
 REQUEST_COUNT = Counter('request_count', 'Total number of requests', ['method', 'endpoint', 'status_code'])
-REQUEST_LATENCY = Summary('request_latency_seconds', 'Latency of requests in seconds')
+REQUEST_LATENCY = Histogram(
+    'request_latency_seconds',
+    'Latency of requests in seconds',
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5)
+)
 
 @app.middleware("http")
 async def add_prometheus_metrics(request: Request, call_next):
@@ -81,10 +218,14 @@ async def add_prometheus_metrics(request: Request, call_next):
     response = await call_next(request)
     process_time = time() - start_time
 
+    # Label by route template (e.g. /users/{user_id}), not the raw path, to keep the series count bounded
+    route = request.scope.get("route")
+    endpoint = getattr(route, "path", "unmatched")
+
     # Record custom metrics
     REQUEST_COUNT.labels(
         method=request.method,
-        endpoint=request.url.path,
+        endpoint=endpoint,
         status_code=response.status_code
     ).inc()
 
@@ -94,252 +235,280 @@ async def add_prometheus_metrics(request: Request, call_next):
 
 
 
-# Helper function with Retry + Circuit Breaker for fetching user data
-@retry_strategy
-@breaker
-def fetch_user_from_supabase(user_id: str):
+# Supabase failures surfacing from any route are translated to 503 (unavailable) or
+# 502 (query rejected) responses here, once, instead of in every route body
+@app.exception_handler(httpx.HTTPError)
+async def supabase_unavailable_handler(request: Request, exc: httpx.HTTPError):
+    return ORJSONResponse(
+        status_code=503,
+        content={"detail": "Service temporarily unavailable after multiple retry attempts. Please try again later."}
+    )
 
-    # If not a valid UUID regex, raise an HTTP 400 error
-    if not re.match(r"^[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12}$", user_id):
-        raise HTTPException(status_code=400, detail="Invalid UUID format")
+@app.exception_handler(pybreaker.CircuitBreakerError)
+async def circuit_open_handler(request: Request, exc: pybreaker.CircuitBreakerError):
+    return ORJSONResponse(
+        status_code=503,
+        content={"detail": "Service temporarily unavailable due to repeated failures."}
+    )
 
-    graphql_query = """
-        query GetUserById($id: UUID!){ 
-            users_dataCollection(filter: { id: { eq: $id } }){
-                edges {
-                    node {
-                        first_name last_name id email created_at latitude longitude location
-                    } 
-                } 
-            } 
-        }
-    """
-    headers = {
-        "Authorization": f"Bearer {SUPABASE_SERVICE_ROLE_KEY}",
-        "Content-Type": "application/json",
-        "apikey": SUPABASE_KEY,
-    }
+@app.exception_handler(SupabaseGraphQLError)
+async def graphql_error_handler(request: Request, exc: SupabaseGraphQLError):
+    return ORJSONResponse(
+        status_code=502,
+        content={"detail": "Supabase rejected the query."}
+    )
 
-    payload = {"query": graphql_query, "variables": {"id": user_id}}
-    print(SUPABASE_GRAPHQL_URL)
-    response = requests.post(SUPABASE_GRAPHQL_URL, json=payload, headers=headers)
-    
-    if response.status_code != 200:
-        raise requests.exceptions.RequestException("Failed to fetch data from Supabase")
 
-    return response.json()
+# User routes; the JWT is verified once per request for all of them.
+# They return ORJSONResponse directly, skipping FastAPI's jsonable_encoder pass over Supabase data.
+auth_router = APIRouter(prefix=USER_MANAGING_PREFIX, dependencies=[Depends(verify_jwt_token)])
 
+# Public health check routes
+health_router = APIRouter(prefix=USER_MANAGING_PREFIX)
+
+
+HEX_DIGITS = frozenset("0123456789abcdefABCDEF")
+
+# Parse a user ID from a path, query string or request body; if not a canonical 8-4-4-4-12 UUID,
+# raise an HTTP 400 error. The fixed-position checks reject malformed input before uuid.UUID,
+# which would also accept braces, "urn:uuid:" prefixes and undashed hex.
+def validate_uuid(value: str) -> UUID:
+    if (
+        len(value) != 36
+        or value[8] != "-" or value[13] != "-" or value[18] != "-" or value[23] != "-"
+        or not HEX_DIGITS.issuperset(value.replace("-", ""))
+    ):
+        raise HTTPException(status_code=400, detail="Invalid UUID format")
 
-# Get user by ID
-@app.get(f"{USER_MANAGING_PREFIX}"+"/users/{user_id}")
-async def get_user(user_id: str):
     try:
-        data = fetch_user_from_supabase(user_id)
-
-        if not data["data"]["users_dataCollection"]["edges"]:
-            raise HTTPException(
-                status_code=404, detail=f"No user found with ID {user_id}."
-            )
-        
-        user = data["data"]["users_dataCollection"]["edges"][0]["node"]
-        return user
-    
-    except RetryError as retry_error:
-        raise HTTPException(
-            status_code=503,
-            detail="Service temporarily unavailable after multiple retry attempts. Please try again later."
-        )
+        return UUID(value)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid UUID format")
 
-    except pybreaker.CircuitBreakerError:
-        raise HTTPException(
-            status_code=503,
-            detail="Service temporarily unavailable due to repeated failures."
-        )
-    except Exception as e:
-        raise HTTPException(status_code=400, detail=str(e))
-    
+
+# The '{"query": ..., "variables":' part of a GraphQL payload, encoded once per query string;
+# only the variables are serialized per request
+@lru_cache(maxsize=None)
+def graphql_payload_prefix(query: str) -> bytes:
+    return b'{"query":' + orjson.dumps(query) + b',"variables":'
 
 
-# Helper function with Retry + Circuit Breaker for updating user data
+# Helper function with Retry + Circuit Breaker shared by every Supabase GraphQL call
 @retry_strategy
-@breaker
-def update_user_in_supabase(user_id: str, user_data: dict):
+async def supabase_graphql(query: str, variables: Union[dict, bytes], breaker: pybreaker.CircuitBreaker):
+    # Variables may already be serialized to JSON, e.g. straight from a Pydantic model
+    if not isinstance(variables, bytes):
+        variables = orjson.dumps(variables)
+    payload = graphql_payload_prefix(query) + variables + b'}'
+    with breaker.calling():
+        response = await app.state.http.post(SUPABASE_GRAPHQL_PATH, content=payload)
 
-    # If not a valid UUID regex, raise an HTTP 400 error
-    if not re.match(r"^[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12}$", user_id):
-        raise HTTPException(status_code=400, detail="Invalid UUID format")
-    
-    graphql_query = """
-        mutation UpdateUser($id: UUID!, $set: users_dataUpdateInput!) {
-            updateusers_dataCollection(
-                filter: { id: { eq: $id } }
-                set: $set
-                atMost: 1
-            ) {
-                records{
-                    first_name
-                    last_name
-                    location
-                    longitude
-                    latitude
-                }
-            }
-        }
-    """
-    headers = {
-        "Authorization": f"Bearer {SUPABASE_SERVICE_ROLE_KEY}",
-        "Content-Type": "application/json",
-        "apikey": SUPABASE_KEY,
-    }
+        if response.status_code != 200:
+            raise httpx.HTTPError("Failed to query Supabase")
 
-    payload = {
-        "query": graphql_query,
-        "variables": {
-            "id": user_id,
-            "set": user_data,
-        },
-    }
+    return orjson.loads(response.content)
 
-    response = requests.post(SUPABASE_GRAPHQL_URL, json=payload, headers=headers)
 
-    if response.status_code != 200:
-        raise requests.exceptions.RequestException("Failed to update user in Supabase")
+# Forward every parser event to each of the given ijson coroutines
+@ijson.coroutine
+def fan_out_events(*targets):
+    while True:
+        event = (yield)
+        for target in targets:
+            target.send(event)
 
-    return response.json()
 
+# Same as supabase_graphql, but streams the response and only materializes the items under prefix
+@retry_strategy
+async def supabase_graphql_items(query: str, variables: dict, prefix: str, breaker: pybreaker.CircuitBreaker) -> list:
+    payload = graphql_payload_prefix(query) + orjson.dumps(variables) + b'}'
+    items = ijson.sendable_list()
+    errors = ijson.sendable_list()
+    # A single parse collects both the requested items and any GraphQL errors
+    parser = ijson.parse_coro(
+        fan_out_events(
+            ijson.common.items_basecoro(items, prefix),
+            ijson.common.items_basecoro(errors, "errors.item"),
+        ),
+        use_float=True,
+    )
+    with breaker.calling():
+        async with app.state.http.stream("POST", SUPABASE_GRAPHQL_PATH, content=payload) as response:
+            if response.status_code != 200:
+                raise httpx.HTTPError("Failed to query Supabase")
 
-# Edit user by ID
-@app.put(f"{USER_MANAGING_PREFIX}"+"/users/{user_id}")
-async def edit_user(user_id: str, user: UserUpdate):
-    try:
-        user_data = user.model_dump(exclude_unset=True)
-        data = update_user_in_supabase(user_id, user_data)
-        return data
-    
-    except RetryError as retry_error:
+            async for chunk in response.aiter_bytes():
+                parser.send(chunk)
+
+    parser.close()
+
+    # pg_graphql reports query errors with a 200 status and "data": null
+    if errors:
+        raise SupabaseGraphQLError(errors)
+
+    return items
+
+
+# Fetch several users in a single round-trip
+async def fetch_users_from_supabase(user_ids: List[UUID]):
+    return await supabase_graphql_items(
+        GET_USERS_QUERY,
+        {"ids": user_ids, "first": len(user_ids)},
+        "data.users_dataCollection.edges.item.node",
+        read_breaker,
+    )
+
+
+# Get user by ID
+@auth_router.get("/users/{user_id}")
+async def get_user(user_id: str):
+    user_id = validate_uuid(user_id)
+    user = user_cache.get(user_id)
+    if user is not None:
+        return ORJSONResponse(user)
+
+    # Concurrent lookups are coalesced into one batched query, which also fills user_cache
+    user = await app.state.user_loader.load(user_id)
+
+    if user is None:
         raise HTTPException(
-            status_code=503,
-            detail="Service temporarily unavailable after multiple retry attempts. Please try again later."
+            status_code=404, detail=f"No user found with ID {user_id}."
         )
 
-    except pybreaker.CircuitBreakerError:
+    return ORJSONResponse(user)
+
+
+# Get users by a comma-separated list of IDs
+@auth_router.get("/users")
+async def get_users(ids: str):
+    user_ids = list(dict.fromkeys(validate_uuid(user_id.strip()) for user_id in ids.split(",") if user_id.strip()))
+    if not user_ids:
+        raise HTTPException(status_code=400, detail="No user IDs given.")
+    if len(user_ids) > MAX_USERS_PER_BATCH:
         raise HTTPException(
-            status_code=503,
-            detail="Service temporarily unavailable due to repeated failures."
+            status_code=400, detail=f"At most {MAX_USERS_PER_BATCH} user IDs can be fetched at once."
         )
-    except Exception as e:
-        raise HTTPException(status_code=400, detail=str(e))
-    
 
-# Helper function with Retry + Circuit Breaker for inserting user data
-@retry_strategy
-@breaker
-def insert_user_in_supabase(user_data: dict):
-    # Validate UUID format for user ID
-    if not re.match(r"^[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12}$", user_data.get("id", "")):
-        raise HTTPException(status_code=400, detail="Invalid UUID format")
+    # Queued together, so they still go out as one query; the loader fills user_cache
+    users = await asyncio.gather(*(app.state.user_loader.load(user_id) for user_id in user_ids))
+    return ORJSONResponse([user for user in users if user is not None])
 
-    graphql_query = """
-        mutation InsertUser($id: UUID!, $email: String!, $first_name: String!, $last_name: String!, $location: String!, $latitude: Float!, $longitude: Float!) {
-            insertIntousers_dataCollection(objects: {
-                id: $id,
-                email: $email,
-                first_name: $first_name,
-                last_name: $last_name,
-                location: $location,
-                latitude: $latitude,
-                longitude: $longitude
-            }) {
-                records {
-                    id
-                    email
-                    first_name
-                    last_name
-                    location
-                    latitude
-                    longitude
-                }
-            }
-        }
-    """
-    headers = {
-        "Authorization": f"Bearer {SUPABASE_SERVICE_ROLE_KEY}",
-        "Content-Type": "application/json",
-        "apikey": SUPABASE_KEY,
-    }
 
-    payload = {
-        "query": graphql_query,
-        "variables": user_data,
-    }
+# Update user data
+async def update_user_in_supabase(user_id: UUID, user_data: bytes):
+    variables = b'{"id":' + orjson.dumps(user_id) + b',"set":' + user_data + b'}'
+    return await supabase_graphql(UPDATE_USER_QUERY, variables, update_breaker)
 
-    # print(payload)
-    response = requests.post(SUPABASE_GRAPHQL_URL, json=payload, headers=headers)
 
-    if response.status_code != 200:
-        raise requests.exceptions.RequestException("Failed to insert user in Supabase")
+# Edit user by ID
+@auth_router.put("/users/{user_id}")
+async def edit_user(user_id: str, user: UserUpdate):
+    user_id = validate_uuid(user_id)
+    user_data = USER_UPDATE_ADAPTER.dump_json(user, exclude_unset=True)
+    data = await update_user_in_supabase(user_id, user_data)
+    app.state.user_loader.forget(user_id)
+    return ORJSONResponse(data)
+
+
+# Helper function with Retry + Circuit Breaker that creates the user, or updates it if the ID
+# already exists, in a single round-trip (PostgREST upsert)
+@retry_strategy
+async def upsert_user_in_supabase(user_data: bytes):
+    with insert_breaker.calling():
+        response = await app.state.http.post(
+            SUPABASE_USERS_REST_PATH,
+            params=UPSERT_USER_PARAMS,
+            headers=UPSERT_USER_HEADERS,
+            content=user_data
+        )
 
-    return response.json()
+        if response.status_code not in (200, 201):
+            raise httpx.HTTPError("Failed to upsert user in Supabase")
+
+    return orjson.loads(response.content)
 
 
 # Create user endpoint
-@app.post(f"{USER_MANAGING_PREFIX}/users")
+@auth_router.post("/users")
 async def create_user(user: UserCreate):
-    try:
-        user_data = user.model_dump()
+    user_id = validate_uuid(user.id)
+    user_data = USER_CREATE_ADAPTER.dump_json(user)
 
-        data = insert_user_in_supabase(user_data)
-        return data['data']['insertIntousers_dataCollection']['records'][0]
-    
-    except RetryError as retry_error:
-        raise HTTPException(
-            status_code=503,
-            detail="Service temporarily unavailable after multiple retry attempts. Please try again later."
-        )
+    records = await upsert_user_in_supabase(user_data)
+    # An upsert may overwrite an existing user, so drop any cached or in-flight copy
+    app.state.user_loader.forget(user_id)
+    return ORJSONResponse(records[0])
 
-    except pybreaker.CircuitBreakerError:
-        raise HTTPException(
-            status_code=503,
-            detail="Service temporarily unavailable due to repeated failures."
-        )
-    except Exception as e:
-        raise HTTPException(status_code=400, detail=str(e))
-    
+
+app.include_router(auth_router)
+
+
+# Upper bound for a single Supabase health probe, in seconds
+HEALTH_PROBE_TIMEOUT = 2.0
+
+# Probe results are reused for this long, so frequent scrapes do not multiply upstream load
+HEALTH_CACHE_TTL = 2.0  # seconds
+health_cache: Dict[str, Tuple[float, object]] = {}
+health_cache_locks: Dict[str, asyncio.Lock] = {}
+
+# Run the probe at most once per HEALTH_CACHE_TTL; concurrent callers wait for the same run.
+# Only leaf probes are cached, so a reported result is never more than HEALTH_CACHE_TTL old.
+async def cached_probe(name: str, probe: Callable[[], Awaitable]):
+    lock = health_cache_locks.get(name)
+    if lock is None:
+        lock = health_cache_locks[name] = asyncio.Lock()
+    async with lock:
+        cached = health_cache.get(name)
+        if cached is not None and monotonic() - cached[0] < HEALTH_CACHE_TTL:
+            return cached[1]
+
+        result = await probe()
+        health_cache[name] = (monotonic(), result)
+        return result
 
 # Health check endpoint
-@app.get(f"{USER_MANAGING_PREFIX}/health/general")
+@health_router.get("/health/general")
 async def health_check():
     return {"status": "ok"}
 
+# Supabase probe shared by the database and readiness checks
+async def check_database_health() -> HealthComponent:
+    # > curl https://<project-ref>.supabase.co/customer/v1/privileged/metrics --user 'service_role:<service-role-jwt>'
+    try:
+        # Only the status matters; the stream is closed without downloading the metrics body
+        async with app.state.http.stream(
+            "GET",
+            SUPABASE_METRICS_PATH,
+            auth=SUPABASE_METRICS_AUTH,
+            timeout=HEALTH_PROBE_TIMEOUT
+        ) as response:
+            status_code = response.status_code
+    except httpx.HTTPError:
+        return HealthComponent(status=HealthStatus.DOWN, details="Supabase service is unreachable.")
+
+    if status_code != 200:
+        return HealthComponent(status=HealthStatus.DOWN, details="Supabase service is unavailable.")
+    return HealthComponent(status=HealthStatus.UP, details="Supabase service is operational.")
+
 # SUpabase health check endpoint
-@app.get(f"{USER_MANAGING_PREFIX}/health/database")
+@health_router.get("/health/database")
 async def supabase_health_check():
-    try:
-        # > curl https://<project-ref>.supabase.co/customer/v1/privileged/metrics --user 'service_role:<service-role-jwt>'
-        response = requests.get(f"{SUPABASE_URL}/customer/v1/privileged/metrics", auth=("service_role", SUPABASE_SERVICE_ROLE_KEY))
-                
-        if response.status_code != 200:
-            raise HTTPException(
-                status_code=503,
-                detail="Supabase service is unavailable."
-            )
-        return {"status": "ok"}
-    
-    except requests.exceptions.RequestException:
-        # Print the original exception
-        
+    database_health = await cached_probe("database", check_database_health)
+
+    if database_health.status != HealthStatus.UP:
         raise HTTPException(
             status_code=503,
             detail="Supabase service is unavailable."
         )
+    return {"status": "ok"}
     
-@app.get(f"{USER_MANAGING_PREFIX}/health/cpu", response_model=HealthResponse)
+@health_router.get("/health/cpu", response_model=HealthResponse)
 async def cpu_health_check():
     cpu_health = check_cpu_health()
     return HealthResponse(status=cpu_health.status, components={"cpu": cpu_health})
 
-@app.get(f"{USER_MANAGING_PREFIX}/health/disk", response_model=HealthResponse)
-async def disk_health_check():
+@health_router.get("/health/disk", response_model=HealthResponse)
+def disk_health_check():
     """
     Check the health of the disk.
     """
@@ -349,34 +518,38 @@ async def disk_health_check():
         components={"disk": disk_health}
     )
     
-@app.get(f"{USER_MANAGING_PREFIX}/health/readiness", response_model=HealthResponse)
+# Run every health probe concurrently, so latency is that of the slowest probe.
+# A probe that raises is reported as DOWN without failing the others.
+async def aggregate_health() -> Dict[str, HealthComponent]:
+    names = ("cpu", "database", "disk")
+    results = await asyncio.gather(
+        asyncio.to_thread(check_cpu_health),
+        cached_probe("database", check_database_health),
+        asyncio.to_thread(check_disk_health),
+        return_exceptions=True,
+    )
+    return {
+        name: HealthComponent(status=HealthStatus.DOWN, details=str(result))
+        if isinstance(result, Exception) else result
+        for name, result in zip(names, results)
+    }
+
+@health_router.get("/health/readiness", response_model=HealthResponse)
 async def readiness_check():
     """
     Check the readiness of the service.
     """
     try:
-        # Perform all health checks
-        cpu_health = check_cpu_health()
-        disk_health = check_disk_health()
-        
-        # Call supabase health logic directly, avoiding the async route call
-        response = requests.get(
-            f"{SUPABASE_URL}/customer/v1/privileged/metrics",
-            auth=("service_role", SUPABASE_SERVICE_ROLE_KEY)
-        )
-        
-        if response.status_code != 200:
-            database_health = HealthComponent(status=HealthStatus.DOWN, details="Supabase service is unavailable.")
-        else:
-            database_health = HealthComponent(status=HealthStatus.UP, details="Supabase service is operational.")
-        
+        # Perform all health checks concurrently
+        components = await aggregate_health()
+
+        status = HealthStatus.UP
+        if any(component.status != HealthStatus.UP for component in components.values()):
+            status = HealthStatus.DOWN
+
         return HealthResponse(
-            status=HealthStatus.UP,
-            components={
-                "cpu": cpu_health,
-                "database": database_health,
-                "disk": disk_health
-            }
+            status=status,
+            components=components
         )
     
     except Exception as e:
@@ -386,5 +559,6 @@ async def readiness_check():
                 "error": HealthComponent(status=HealthStatus.DOWN, details=str(e))
             }
         )
-        
 
+
+app.include_router(health_router)
@@ -1,6 +1,5 @@
-from pydantic import BaseModel
-from typing import Optional
-from typing import Dict, Union
+from pydantic import BaseModel, ConfigDict
+from typing import Dict, Optional, Union
 
 class HealthStatus:
     UP = "UP"
@@ -16,6 +15,8 @@ class HealthResponse(BaseModel):
 
 
 class User(BaseModel):
+    model_config = ConfigDict(extra='ignore', frozen=True)
+
     id: str
     email: str
     first_name: str
@@ -26,6 +27,8 @@ class User(BaseModel):
 
 
 class UserUpdate(BaseModel):
+    model_config = ConfigDict(extra='ignore', frozen=True)
+
     first_name: Optional[str] = None
     last_name: Optional[str] = None
     email: Optional[str] = None
@@ -34,6 +37,8 @@ class UserUpdate(BaseModel):
     location: Optional[str] = None
 
 class UserCreate(BaseModel):
+    model_config = ConfigDict(extra='ignore', frozen=True)
+
     id: str
     email: str
     first_name: str
@@ -0,0 +1,90 @@
+import asyncio
+from typing import Awaitable, Callable, Dict, List, MutableMapping, Optional
+from uuid import UUID
+
+# Batch fetcher: takes a list of user IDs and returns the user records that exist
+BatchFetch = Callable[[List[UUID]], Awaitable[List[dict]]]
+
+class UserLoader:
+    """
+    Coalesce concurrent single-user lookups into one batched Supabase query.
+
+    Lookups arriving within `delay` seconds of each other (or until `max_batch_size`
+    IDs are pending) are resolved by a single call to `batch_fetch`. A lookup for an
+    ID that is already pending or in flight joins that request instead of issuing another.
+    Users found are stored in `cache`, unless their ID was forgotten while the lookup was in flight.
+    """
+
+    def __init__(self, batch_fetch: BatchFetch, cache: MutableMapping[UUID, dict], max_batch_size: int = 30, delay: float = 0.005):
+        self.batch_fetch = batch_fetch
+        self.cache = cache
+        self.max_batch_size = max_batch_size
+        self.delay = delay
+        self._pending: Dict[UUID, asyncio.Future] = {}
+        self._inflight: Dict[UUID, asyncio.Future] = {}
+        self._flush_handle: Optional[asyncio.TimerHandle] = None
+        self._tasks = set()  # Strong references to in-flight batches
+
+    async def load(self, user_id: UUID) -> Optional[dict]:
+        """
+        Return the user with the given ID, or None if it does not exist.
+        """
+        future = self._pending.get(user_id) or self._inflight.get(user_id)
+        if future is None:
+            loop = asyncio.get_running_loop()
+            future = loop.create_future()
+            self._pending[user_id] = future
+
+            if len(self._pending) >= self.max_batch_size:
+                self._flush()
+            elif self._flush_handle is None:
+                self._flush_handle = loop.call_later(self.delay, self._flush)
+
+        # Shielded so one cancelled caller does not cancel the lookup for everyone else
+        return await asyncio.shield(future)
+
+    def forget(self, user_id: UUID):
+        """
+        Drop the cached user and stop later lookups from joining a request already in flight.
+
+        Call this after the user was written. The in-flight request may have read the old row,
+        so its callers still get that result but it is not cached. Pending lookups are kept:
+        they have not been sent yet, so they will read the new row.
+        """
+        self.cache.pop(user_id, None)
+        self._inflight.pop(user_id, None)
+
+    def _flush(self):
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+
+        batch, self._pending = self._pending, {}
+        if batch:
+            self._inflight.update(batch)
+            task = asyncio.create_task(self._dispatch(batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _dispatch(self, batch: Dict[UUID, asyncio.Future]):
+        try:
+            users = await self.batch_fetch(list(batch))
+        except Exception as e:
+            for future in batch.values():
+                if not future.done():
+                    future.set_exception(e)
+            return
+        finally:
+            # IDs forgotten while in flight are no longer tracked here, so their results are not cached
+            current = [user_id for user_id, future in batch.items() if self._inflight.get(user_id) is future]
+            for user_id in current:
+                del self._inflight[user_id]
+
+        users_by_id = {UUID(user["id"]): user for user in users}
+        for user_id in current:
+            if user_id in users_by_id:
+                self.cache[user_id] = users_by_id[user_id]
+
+        for user_id, future in batch.items():
+            if not future.done():
+                future.set_result(users_by_id.get(user_id))